@@ -1,18 +1,50 @@
-from notion_client import Client
 from datetime import date, timedelta
-import os
+from functools import lru_cache
+from notion_api import DATABASE_ID, call_with_retry, get_client, get_database_properties
+import time
+from urllib.parse import unquote
 
-notion_auth = os.getenv("NOTION_TOKEN")
-notion = Client(auth=notion_auth)
+_property_ids = None
 
-DATABASE_ID = os.getenv("NOTION_DATABASE_ID")
+MEETINGS_CACHE_TTL = 60  # seconds a query result is reused before asking Notion again
+_meetings_cache = {}  # (database_id, day) -> (expires_at, results)
 
 
-def get_todays_meetings():
-    today = date.today()                # this is a date object
+def _meeting_property_ids():
+    """Look up the ids of the Name and Date properties once, for filter_properties."""
+    global _property_ids
+    if _property_ids is None:
+        try:
+            properties = get_database_properties(DATABASE_ID)
+            # Notion returns the ids URL-encoded (e.g. "%3AUPp"), and httpx encodes
+            # query params again, so decode them first.
+            _property_ids = [unquote(properties["Name"]["id"]), unquote(properties["Date"]["id"])]
+        except Exception as e:
+            # Left unset, so the next call tries the lookup again
+            print("Could not look up meeting property ids, fetching full pages:", e)
+            return []
+    return _property_ids
+
+
+def meeting_title(props):
+    title = props["Name"]["title"]
+    return title[0]["text"]["content"] if title else "No title"
+
+
+def meeting_start(props):
+    return props["Date"]["date"]["start"]
+
+
+def invalidate_meetings_cache():
+    """Forget cached query results so the next call hits Notion."""
+    _meetings_cache.clear()
+
+
+@lru_cache(maxsize=2)
+def _payload_for(ordinal, property_ids):
+    """Build the query payload for one day; it only changes at midnight."""
+    today = date.fromordinal(ordinal)   # this is a date object
     tomorrow = today + timedelta(days=1)  # add timedelta to date object
-    today_str = today.isoformat()         # convert to string when needed
-    tomorrow_str = tomorrow.isoformat()
 
     # Notion date filter format requires ISO 8601 string
     filter_payload = {
@@ -31,11 +63,40 @@ def get_todays_meetings():
                     }
                 }
             ]
-        }
+        },
+        # Let Notion order by start time so the next meeting comes first
+        "sorts": [{"property": "Date", "direction": "ascending"}],
+        "page_size": 25
     }
 
-    response = notion.databases.query(database_id=DATABASE_ID, **filter_payload)
-    return response.get("results", [])
+    # Only Name and Date are read downstream, so don't transfer the rest
+    if property_ids:
+        filter_payload["filter_properties"] = list(property_ids)
+    return filter_payload
+
+
+def get_todays_meetings():
+    today = date.today()
+
+    cache_key = (DATABASE_ID, today.isoformat())
+    cached = _meetings_cache.get(cache_key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    filter_payload = _payload_for(today.toordinal(), tuple(_meeting_property_ids()))
+
+    notion = get_client()
+    response = call_with_retry(notion.databases.query, database_id=DATABASE_ID, **filter_payload)
+    results = response.get("results", [])
+    # Notion returns at most one page of results per call; follow the cursor
+    while response.get("has_more"):
+        response = call_with_retry(
+            notion.databases.query, database_id=DATABASE_ID, start_cursor=response["next_cursor"], **filter_payload
+        )
+        results.extend(response.get("results", []))
+    _meetings_cache.clear()  # only today's entry is ever useful
+    _meetings_cache[cache_key] = (time.monotonic() + MEETINGS_CACHE_TTL, results)
+    return results
 def print_meetings(meetings):
     if not meetings:
         print("No meetings found for today.")
@@ -44,8 +105,8 @@ def print_meetings(meetings):
     print(f"Meetings today ({len(meetings)} found):")
     for m in meetings:
         props = m["properties"]
-        title = props["Name"]["title"][0]["text"]["content"] if props["Name"]["title"] else "No title"
-        date_start = props["Date"]["date"]["start"]
+        title = meeting_title(props)
+        date_start = meeting_start(props)
         date_end = props["Date"]["date"].get("end", "N/A")
         print(f"- {title}: {date_start} to {date_end}")
         
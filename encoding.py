@@ -1,21 +1,27 @@
 # This reads your file with detected encoding and saves as UTF-8
 
-import chardet
+import os
+import shutil
+from chardet.universaldetector import UniversalDetector
 
 filename = 'notion_writer.py'
+CHUNK_SIZE = 65536
 
-# Detect encoding
+# Detect encoding, feeding chunks only until chardet is confident
+detector = UniversalDetector()
 with open(filename, 'rb') as f:
-    rawdata = f.read()
-    result = chardet.detect(rawdata)
-    encoding = result['encoding']
-    print(f"Detected encoding: {encoding}")
+    for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+        detector.feed(chunk)
+        if detector.done:
+            break
+detector.close()
+encoding = detector.result['encoding']
+print(f"Detected encoding: {encoding}")
 
-# Read with detected encoding and save as UTF-8
-with open(filename, 'r', encoding=encoding) as f:
-    content = f.read()
-
-with open(filename, 'w', encoding='utf-8') as f:
-    f.write(content)
+# Stream-transcode to a temp file, then swap it in atomically
+tmp_filename = filename + '.tmp'
+with open(filename, 'r', encoding=encoding) as src, open(tmp_filename, 'w', encoding='utf-8') as dst:
+    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+os.replace(tmp_filename, filename)
 
 print(f"File '{filename}' converted to UTF-8.")
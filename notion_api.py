@@ -0,0 +1,178 @@
+from notion_client import APIErrorCode, APIResponseError, AsyncClient, Client
+from pathlib import Path
+import asyncio
+import atexit
+import hashlib
+import httpx
+import json
+import os
+import threading
+import time
+
+try:
+    import orjson
+except ImportError:  # optional: fall back to httpx's stdlib encoder
+    orjson = None
+
+NOTION_TOKEN = os.getenv("NOTION_TOKEN")
+DATABASE_ID = os.getenv("NOTION_DATABASE_ID")  # the Team-Meetings database
+
+# Notion allows an average of 3 requests per second per integration; stay a bit under
+NOTION_REQUESTS_PER_SECOND = 2.5
+MAX_RATE_LIMIT_RETRIES = 5
+SCHEMA_CACHE_DIR = Path.home() / ".cache" / "seshat"
+SCHEMA_CACHE_TTL = 24 * 60 * 60  # seconds before a cached database schema is re-fetched
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+_schemas = {}  # database_id -> properties
+
+
+class _OrjsonRequests:
+    """httpx client mixin that encodes JSON request bodies with orjson."""
+
+    def build_request(self, method, url, *, json=None, headers=None, **kwargs):
+        if json is None:
+            return super().build_request(method, url, headers=headers, **kwargs)
+        headers = httpx.Headers(headers)
+        headers["Content-Type"] = "application/json"
+        return super().build_request(method, url, content=orjson.dumps(json), headers=headers, **kwargs)
+
+
+class _OrjsonClient(_OrjsonRequests, httpx.Client):
+    pass
+
+
+class _OrjsonAsyncClient(_OrjsonRequests, httpx.AsyncClient):
+    pass
+
+
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=10)
+
+
+def get_client():
+    """Return the process-wide Notion client, created on first use over a pooled HTTP/2 session."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            client_class = _OrjsonClient if orjson is not None else httpx.Client
+            _client = Client(auth=NOTION_TOKEN, client=client_class(http2=True, limits=_HTTP_LIMITS))
+    return _client
+
+
+def get_async_client():
+    """Return the process-wide async Notion client, for use from the agent's event loop."""
+    global _async_client
+    with _client_lock:
+        if _async_client is None:
+            client_class = _OrjsonAsyncClient if orjson is not None else httpx.AsyncClient
+            _async_client = AsyncClient(auth=NOTION_TOKEN, client=client_class(http2=True, limits=_HTTP_LIMITS))
+    return _async_client
+
+
+def close_client():
+    """Close the pooled sync session; registered to run at exit."""
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+
+
+async def aclose_async_client():
+    """Close the async client's session; call before the event loop that used it shuts down."""
+    global _async_client
+    with _client_lock:
+        client, _async_client = _async_client, None
+    if client is not None:
+        await client.aclose()
+
+
+atexit.register(close_client)
+
+
+class _RateLimiter:
+    """Hand out request slots at a fixed rate, shared by every thread."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Claim the next slot and return how many seconds to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        return slot - now
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+_limiter = _RateLimiter(NOTION_REQUESTS_PER_SECOND)
+
+
+def _retry_after(error: APIResponseError) -> float:
+    """Seconds Notion asked us to back off for, defaulting to 1."""
+    try:
+        return float(error.headers.get("retry-after", 1))
+    except ValueError:
+        return 1.0
+
+
+def call_with_retry(fn, *args, **kwargs):
+    """Call a notion-client method under the shared rate limit, retrying 429s after Retry-After."""
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        _limiter.acquire()
+        try:
+            return fn(*args, **kwargs)
+        except APIResponseError as e:
+            if e.code != APIErrorCode.RateLimited or attempt == MAX_RATE_LIMIT_RETRIES:
+                raise
+            delay = _retry_after(e)
+            print(f"Notion rate limit hit, retrying in {delay:g}s...")
+            time.sleep(delay)
+
+
+async def call_with_retry_async(fn, *args, **kwargs):
+    """Await an AsyncClient method under the same shared rate limit as call_with_retry."""
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        if (wait := _limiter.reserve()) > 0:
+            await asyncio.sleep(wait)
+        try:
+            return await fn(*args, **kwargs)
+        except APIResponseError as e:
+            if e.code != APIErrorCode.RateLimited or attempt == MAX_RATE_LIMIT_RETRIES:
+                raise
+            delay = _retry_after(e)
+            print(f"Notion rate limit hit, retrying in {delay:g}s...")
+            await asyncio.sleep(delay)
+
+
+def get_database_properties(database_id: str) -> dict:
+    """Return a database's property schema, cached in memory and on disk for a day."""
+    if database_id in _schemas:
+        return _schemas[database_id]
+
+    key = hashlib.sha256(f"{NOTION_TOKEN}:{database_id}".encode("utf-8")).hexdigest()[:16]
+    cache_path = SCHEMA_CACHE_DIR / f"notion_db_{key}.json"
+    try:
+        if time.time() - cache_path.stat().st_mtime < SCHEMA_CACHE_TTL:
+            _schemas[database_id] = json.loads(cache_path.read_text(encoding="utf-8"))
+            return _schemas[database_id]
+    except (OSError, ValueError):
+        pass  # missing, stale or unreadable: fetch it again
+
+    properties = call_with_retry(get_client().databases.retrieve, database_id=database_id)["properties"]
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        cache_path.write_text(json.dumps(properties), encoding="utf-8")
+    except OSError as e:
+        print("Could not cache Notion database schema:", e)
+    _schemas[database_id] = properties
+    return properties
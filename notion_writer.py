@@ -1,104 +1,187 @@
-from notion_client import Client
+from notion_client import APIResponseError
+from notion_api import (
+    DATABASE_ID, call_with_retry, call_with_retry_async, get_async_client, get_client, get_database_properties
+)
+from dataclasses import dataclass
 from datetime import datetime
-import os
-notion_auth = os.getenv("NOTION_TOKEN")
-notion = Client(auth=notion_auth)
+from functools import lru_cache
+import asyncio
+from itertools import chain
+from types import MappingProxyType
+from typing import Optional
+import re
 
-DATABASE_ID = os.getenv("NOTION_DATABASE_ID")
+NOTION_MAX_CHILDREN = 100  # Notion accepts at most 100 blocks per request
+NOTION_MAX_TEXT_LENGTH = 2000  # and at most 2000 characters per text object
+REQUIRED_PROPERTIES = ("Name", "Date")
 
-def create_meeting_page(meeting_data: dict, analysis: dict):
-    """Push one meeting’s analysis into the Team-Meetings database."""
+# A bullet line: the marker (-, * or •), the run of "*", "-" and spaces after it,
+# any other whitespace, then the text
+_BULLET_LINE = re.compile(r"\s*[*•-](?P<run>[*\- ]*)\s*(?P<text>.*?)\s*")
+
+# Read-only top-level keys for each block type; builders shallow-copy them
+_BLOCK_TEMPLATES = {
+    block_type: MappingProxyType({"object": "block", "type": block_type})
+    for block_type in ("heading_2", "paragraph", "bulleted_list_item", "to_do")
+}
+
+# (heading, analysis key, how the section's text is rendered)
+SECTIONS = (
+    ("📝 Summary", "summary", "paragraph"),
+    ("👥 Participants", "participants", "list"),
+    ("✅ Tasks", "tasks", "tasks"),
+    ("📆 Deadlines & Reminders", "deadlines", "markdown"),
+    ("📌 Key Decisions", "decisions", "markdown"),
+    ("💡 Insights & Recommendations", "insights", "markdown"),
+)
+
+
+def _check_schema():
+    """Fail fast if the database lacks a property we write, instead of sending a doomed request."""
+    try:
+        properties = get_database_properties(DATABASE_ID)
+    except Exception as e:
+        print("Could not check the Notion database schema:", e)
+        return
+    missing = [name for name in REQUIRED_PROPERTIES if name not in properties]
+    if missing:
+        raise ValueError(f"Notion database is missing properties: {', '.join(missing)}")
+
+def _page_content(meeting_data: dict, analysis: dict):
+    """Build the page properties and the full list of body blocks for one meeting."""
     title = meeting_data.get("title", "Untitled Meeting")
     date  = meeting_data.get("date", datetime.now().isoformat())
+    properties = {
+        "Name": {"title": [{"text": {"content": title}}]},
+        "Date": {"date": {"start": date}}
+    }
+    # Each section streams its blocks straight into one list, no per-section lists
+    children = list(chain.from_iterable(
+        chain((_heading(heading),), _section_blocks(kind, analysis[key]))
+        for heading, key, kind in SECTIONS
+    ))
+    return properties, children
+
+@dataclass
+class PageResult:
+    """Outcome of writing a meeting page; error is set if Notion rejected a request."""
+    page_id: Optional[str] = None
+    url: Optional[str] = None
+    error: Optional[str] = None
+
+def _page_result(page, error=None):
+    if error is not None:
+        print("Failed to write the Notion page:", error)
+    else:
+        print(f"Notion page created: {page['url']}")
+    if page is None:
+        return PageResult(error=error)
+    return PageResult(page_id=page["id"], url=page["url"], error=error)
+
+def create_meeting_page(meeting_data: dict, analysis: dict) -> PageResult:
+    """Push one meeting’s analysis into the Team-Meetings database."""
+    _check_schema()
+    properties, children = _page_content(meeting_data, analysis)
 
-    page = notion.pages.create(
-        parent={"database_id": DATABASE_ID},
-        properties={
-            "Name": {"title": [{"text": {"content": title}}]},
-            "Date": {"date": {"start": date}}
-        },
-        children=[
-            _heading("📝 Summary"),
-            _paragraph(analysis["summary"]),
-            _heading("👥 Participants"),
-            * _bulleted_list(analysis["participants"].split(", ")),   # ⬅️ unpack list
-            _heading("✅ Tasks"),
-            * _task_blocks(analysis["tasks"]),                        # ⬅️ unpack list
-            _heading("📆 Deadlines & Reminders"),
-            * _markdown_blocks(analysis["deadlines"]),                # ⬅️ unpack list
-            _heading("📌 Key Decisions"),
-            * _markdown_blocks(analysis["decisions"]),                # ⬅️ unpack list
-            _heading("💡 Insights & Recommendations"),
-            * _markdown_blocks(analysis["insights"])                  # ⬅️ unpack list
-        ]
-    )
-    print(f"Notion page created: {page['url']}")
-    return page
-
-
-# ---------- helper block builders (unchanged) ----------
+    # Create the page with the first batch of blocks, then append the rest
+    notion = get_client()
+    page = None
+    try:
+        page = call_with_retry(
+            notion.pages.create,
+            parent={"database_id": DATABASE_ID},
+            properties=properties,
+            children=children[:NOTION_MAX_CHILDREN]
+        )
+        for start in range(NOTION_MAX_CHILDREN, len(children), NOTION_MAX_CHILDREN):
+            call_with_retry(
+                notion.blocks.children.append,
+                block_id=page["id"],
+                children=children[start:start + NOTION_MAX_CHILDREN]
+            )
+    except APIResponseError as e:
+        return _page_result(page, error=f"{e.code}: {e}")
+    return _page_result(page)
 
+async def create_meeting_page_async(meeting_data: dict, analysis: dict) -> PageResult:
+    """Like create_meeting_page, but awaits Notion instead of blocking a thread."""
+    await asyncio.to_thread(_check_schema)  # cached after the first call
+    properties, children = _page_content(meeting_data, analysis)
+
+    notion = get_async_client()
+    page = None
+    try:
+        page = await call_with_retry_async(
+            notion.pages.create,
+            parent={"database_id": DATABASE_ID},
+            properties=properties,
+            children=children[:NOTION_MAX_CHILDREN]
+        )
+        # Batches stay sequential so the blocks keep their order on the page
+        for start in range(NOTION_MAX_CHILDREN, len(children), NOTION_MAX_CHILDREN):
+            await call_with_retry_async(
+                notion.blocks.children.append,
+                block_id=page["id"],
+                children=children[start:start + NOTION_MAX_CHILDREN]
+            )
+    except APIResponseError as e:
+        return _page_result(page, error=f"{e.code}: {e}")
+    return _page_result(page)
+
+
+# ---------- helper block builders ----------
+
+def _section_blocks(kind, text):
+    if kind == "paragraph":
+        return (_paragraph(text),)
+    if kind == "list":
+        return _bulleted_list(text.split(", "))
+    return _markdown_blocks(text, tasks=(kind == "tasks"))
+
+def _rich_text(text):
+    """Split text into Notion text objects of at most 2000 characters each."""
+    # Pre-sized and filled in one pass; short text (the usual case) is one object
+    n = max(1, -(-len(text) // NOTION_MAX_TEXT_LENGTH))
+    rich_text = [None] * n
+    for k in range(n):
+        start = k * NOTION_MAX_TEXT_LENGTH
+        rich_text[k] = {"type": "text", "text": {"content": text[start:start + NOTION_MAX_TEXT_LENGTH]}}
+    return rich_text
+
+def _block(block_type, text, **fields):
+    return {**_BLOCK_TEMPLATES[block_type], block_type: {"rich_text": _rich_text(text), **fields}}
+
+# Headings are only ever the fixed SECTIONS titles, so build each block once and
+# share it between pages (nothing mutates a block after it's built)
+@lru_cache(maxsize=len(SECTIONS))
 def _heading(text):
-    return {
-        "object": "block",
-        "type": "heading_2",
-        "heading_2": {"rich_text": [{"type": "text", "text": {"content": text}}]}
-    }
+    return _block("heading_2", text)
 
 def _paragraph(text):
-    return {
-        "object": "block",
-        "type": "paragraph",
-        "paragraph": {"rich_text": [{"type": "text", "text": {"content": text}}]}
-    }
+    return _block("paragraph", text)
 
 def _bulleted_list(items):
-    return [
-        {
-            "object": "block",
-            "type": "bulleted_list_item",
-            "bulleted_list_item": {
-                "rich_text": [{"type": "text", "text": {"content": item}}]
-            }
-        }
-        for item in items if item.strip()
-    ]
-
-def _task_blocks(markdown_text):
-    lines = markdown_text.splitlines()
-    blocks = []
-    for line in lines:
-        stripped = line.strip()
-        if stripped.startswith(("* **", "- **")):
-            blocks.append(_paragraph(stripped.strip("*- ").replace("**", "")))
-        elif stripped.startswith(("*", "-")) and stripped[1:].strip():
-            blocks.append({
-                "object": "block",
-                "type": "to_do",
-                "to_do": {
-                    "rich_text": [{"type": "text", "text": {"content": stripped.lstrip('*- ').strip()}}],
-                    "checked": False
-                }
-            })
-    return blocks
-
-def _markdown_blocks(markdown_text):
-    blocks = []
+    for item in items:
+        if item.strip():
+            yield _block("bulleted_list_item", item)
+
+def _markdown_blocks(markdown_text, tasks=False):
+    """Yield blocks for markdown lines; with tasks=True bullets become to-dos and bold bullets headers."""
     for line in markdown_text.splitlines():
-        stripped = line.strip()
-        if not stripped:
+        match = _BULLET_LINE.fullmatch(line)
+        if match is None:
+            # Task sections only keep bullet lines
+            if not tasks and (stripped := line.strip()):
+                yield _paragraph(stripped)
             continue
-        if stripped.startswith(("*", "-")):
-            blocks.append({
-                "object": "block",
-                "type": "bulleted_list_item",
-                "bulleted_list_item": {
-                    "rich_text": [{"type": "text", "text": {"content": stripped.lstrip('*- ').strip()}}]
-                }
-            })
-        else:
-            blocks.append(_paragraph(stripped))
-    return blocks
+        text = match["text"]
+        if not tasks:
+            yield _block("bulleted_list_item", text)
+        elif match["run"].startswith(" **"):
+            yield _paragraph(text.rstrip("*- ").replace("**", ""))
+        elif text:
+            yield _block("to_do", text, checked=False)
+
 if __name__ == "__main__":
     import json
 
@@ -1,34 +1,54 @@
 from obswebsocket import obsws, requests
+from pathlib import Path, PureWindowsPath
+import asyncio
+import atexit
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
 import time
 import psutil
 import subprocess
 import socket
 import os
 host = os.getenv("OBS_HOST")
-port = os.getenv("OBS_PORT", "4455")  # Default port for OBS WebSocket
+port = int(os.getenv("OBS_PORT", "4455"))  # Default port for OBS WebSocket
 password = os.getenv("OBS_PASSWORD")  # Set your OBS WebSocket password
 
 # Configuration
 OBS_PATH =os.getenv("OBS_PATH", r"C:\Program Files\obs-studio\bin\64bit\obs64.exe")  # Path to OBS executable
 OBS_DIR = os.getenv("OBS_DIR", r"C:\Program Files\obs-studio\bin\64bit")  # Directory containing OBS executable
+OBS_PROCESS_NAME = PureWindowsPath(OBS_PATH).name  # e.g. obs64.exe
+_OBS_PROCESS_KEY = OBS_PROCESS_NAME.casefold()
 
 def is_obs_running():
+    if os.name == "nt":
+        # One filtered tasklist query instead of opening every process with psutil
+        try:
+            out = subprocess.run(
+                ["tasklist", "/FI", f"IMAGENAME eq {OBS_PROCESS_NAME}", "/NH", "/FO", "CSV"],
+                capture_output=True, text=True, check=True
+            ).stdout
+            return f'"{_OBS_PROCESS_KEY}"' in out.casefold()
+        except (OSError, subprocess.CalledProcessError):
+            pass  # fall back to psutil below
+    # Compare whole image names; only same-length names pay for a casefold() copy
     for proc in psutil.process_iter(['name']):
-        if proc.info['name'] and 'obs64.exe' in proc.info['name'].lower():
+        name = proc.info['name']
+        if name and len(name) == len(OBS_PROCESS_NAME) and name.casefold() == _OBS_PROCESS_KEY:
             return True
     return False
 
 def wait_for_obs_websocket(timeout=20):
     """Wait until OBS WebSocket server is accepting connections."""
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            try:
-                s.settimeout(1)
-                s.connect((host, port))
+    # Probe quickly at first (OBS is often already up), backing off to 1 s
+    deadline = time.monotonic() + timeout
+    delay = 0.05
+    while (remaining := deadline - time.monotonic()) > 0:
+        try:
+            with socket.create_connection((host, port), timeout=min(0.5, remaining)):
                 return True
-            except (ConnectionRefusedError, socket.timeout):
-                time.sleep(1)
+        except OSError:
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 1.0)
     return False
 
 def launch_obs():
@@ -50,26 +70,125 @@ def launch_obs():
     print("OBS WebSocket is ready.")
     return True
 
+class RecordingWatcher(FileSystemEventHandler):
+    """Watch the recordings folder for the file OBS is writing.
+
+    Use as a context manager around start_obs_recording(), then await wait()
+    until the recording stops growing (OBS stopped or crashed) or the timeout
+    runs out, whichever comes first.
+    """
+
+    def __init__(self, recordings_dir, idle_seconds=10, start_timeout=30):
+        self.idle_seconds = idle_seconds
+        self.start_timeout = start_timeout
+        self.path = None
+        self._last_write = None
+        self._observer = Observer()
+        self._observer.schedule(self, str(recordings_dir))
+
+    def __enter__(self):
+        self._observer.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._observer.stop()
+        self._observer.join()
+
+    def on_created(self, event):
+        self._track(event)
+
+    def on_modified(self, event):
+        self._track(event)
+
+    def _track(self, event):
+        if event.is_directory or not event.src_path.endswith(".mp4"):
+            return
+        self.path = Path(event.src_path)
+        self._last_write = time.monotonic()
+
+    def _size(self):
+        try:
+            return os.stat(self.path).st_size
+        except OSError:
+            return None
+
+    async def wait(self, timeout):
+        """Return the recording's path once it is idle or `timeout` elapses (None if never seen)."""
+        start = time.monotonic()
+        deadline = start + timeout
+        last_size = None
+        size_changed = None  # when the file was last seen growing
+        while (remaining := deadline - time.monotonic()) > 0:
+            if self.path is None:
+                # No file at all: StartRecord most likely failed, so don't wait out the meeting
+                if time.monotonic() - start >= self.start_timeout:
+                    print("No recording appeared; giving up on this meeting.")
+                    return None
+                await asyncio.sleep(min(remaining, 1))
+                continue
+            # Change notifications can arrive late and in bursts (on Windows
+            # only when the cache flushes), so the file's own size has to hold
+            # still for the idle window too before OBS counts as stopped.
+            size = self._size()
+            now = time.monotonic()
+            if size_changed is None or size != last_size:
+                last_size, size_changed = size, now
+            idle_for = now - max(size_changed, self._last_write)
+            if idle_for >= self.idle_seconds:
+                break
+            await asyncio.sleep(min(remaining, self.idle_seconds - idle_for))
+        return self.path
+
+_ws = None
+
+def _get_ws():
+    """Connect to the OBS WebSocket once and reuse the connection."""
+    global _ws
+    if _ws is None:
+        ws = obsws(host, port, password)
+        ws.connect()
+        _ws = ws
+    return _ws
+
+def _reset_ws():
+    """Drop the cached connection; the next call reconnects."""
+    global _ws
+    if _ws is not None:
+        try:
+            _ws.disconnect()
+        except Exception:
+            pass
+        _ws = None
+
+atexit.register(_reset_ws)
+
+def _call(request_type):
+    """Send an OBS request, retrying once on a fresh connection if the cached one fails."""
+    # The connection sits idle for the whole meeting between StartRecord and
+    # StopRecord; if OBS restarted or the socket dropped meanwhile, reconnect
+    # rather than leave OBS recording.
+    try:
+        return _get_ws().call(request_type())
+    except Exception:
+        _reset_ws()
+    return _get_ws().call(request_type())
+
 def start_obs_recording():
     if not launch_obs():
         return
     try:
-        ws = obsws(host, port, password)
-        ws.connect()
-        response = ws.call(requests.StartRecord())
+        response = _call(requests.StartRecord)
         print("🎥 Started recording:", response.status)
-        ws.disconnect()
     except Exception as e:
+        _reset_ws()  # OBS may have restarted; reconnect next time
         print("Failed to start recording:", e)
 
 def stop_obs_recording():
     try:
-        ws = obsws(host, port, password)
-        ws.connect()
-        response = ws.call(requests.StopRecord())
+        response = _call(requests.StopRecord)
         print("Stopped recording:", response.status)
-        ws.disconnect()
     except Exception as e:
+        _reset_ws()
         print("Failed to stop recording:", e)
 
 if __name__ == "__main__":
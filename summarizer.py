@@ -1,48 +1,254 @@
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions, retry
+import asyncio
+from functools import lru_cache
+import hashlib
 import json
+import logging
 from pathlib import Path
 import os
 
+try:
+    import orjson
+except ImportError:  # optional: fall back to the stdlib encoder
+    orjson = None
+
+log = logging.getLogger(__name__)
+
+MODEL_NAME = "gemini-1.5-flash-002"
+ANALYSIS_CACHE_DIR = Path.home() / ".cache" / "seshat" / "analysis"
+HASH_CHUNK_SIZE = 1 << 20  # bytes of transcript hashed at a time
+CHARS_PER_TOKEN = 4  # rough size of a Gemini token in English text
+# Transcripts longer than this (about an hour of talk) are condensed window by
+# window before analysis: several small calls, then one over the condensed notes
+COMPRESS_THRESHOLD_TOKENS = 16_000
+WINDOW_TOKENS = 8_000
+WINDOW_OVERLAP_TOKENS = 200
+GEMINI_RETRY_TIMEOUT = 120  # seconds spent retrying one request before giving up
+
+# The per-section instruction, used on its own when falling back to one call per section
+PROMPTS = {
+    "summary": "Summarize the meeting transcript above",
+    "participants": "List the people who actively participated in the meeting transcript above. Only include names that actually spoke or contributed",
+    "tasks": "Extract any tasks or action items from the meeting transcript above. Include assignee names if mentioned",
+    "deadlines": "Extract any deadlines, due dates, or reminders mentioned in the meeting transcript above",
+    "decisions": "List the decisions made by the team in the meeting transcript above",
+    "insights": "What key insights or noteworthy takeaways can be inferred from the meeting transcript above? These could help with teamwork or project alignment"
+}
+
+# Prompts are [header, transcript, instruction]: the transcript goes first and in
+# its own part, so the six fallback calls share a byte-identical prefix that
+# Gemini's implicit caching can reuse, and no prompt copies it into a new string
+_TRANSCRIPT_HEADER = "Meeting transcript:\n---\n"
+_PROMPT_SUFFIXES = {key: f"\n---\n\n{instruction}." for key, instruction in PROMPTS.items()}
+_COMBINED_SUFFIX = "\n---\n\nAnalyze the meeting transcript above and fill in every field of the JSON response."
+_WINDOW_SUFFIX = ("\n---\n\nThe transcript above is one part of a longer meeting. Condense it, keeping every "
+                  "name, task, deadline, decision and notable point, in the order they come up.")
+
+# Rate limits, overload and timeouts are retried with jittered exponential
+# backoff, instead of throwing away an analysis over one transient error
+_REQUEST_OPTIONS = {
+    "retry": retry.Retry(
+        predicate=retry.if_exception_type(
+            google_exceptions.ResourceExhausted,
+            google_exceptions.ServiceUnavailable,
+            google_exceptions.DeadlineExceeded,
+            google_exceptions.InternalServerError
+        ),
+        initial=1.0,
+        maximum=30.0,
+        timeout=GEMINI_RETRY_TIMEOUT,
+        on_error=lambda e: log.warning("Gemini request failed (%s); retrying...", e)
+    )
+}
+
+# What each field of the single combined response should hold, in the shape notion_writer renders
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "summary": {"type": "string", "description": "A summary of the meeting."},
+        "participants": {"type": "string", "description": "Comma-separated names of the people who actually spoke or contributed."},
+        "tasks": {"type": "string", "description": "Markdown bullet list of tasks or action items, with assignee names if mentioned."},
+        "deadlines": {"type": "string", "description": "Markdown bullet list of deadlines, due dates, or reminders mentioned."},
+        "decisions": {"type": "string", "description": "Markdown bullet list of the decisions made by the team."},
+        "insights": {"type": "string", "description": "Markdown bullet list of key insights or takeaways that could help with teamwork or project alignment."}
+    },
+    "required": list(PROMPTS)
+}
+
+def _dump_json(data: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2).encode("utf-8")
+
+def _write_atomic(path: Path, data: bytes):
+    """Write to a sibling temp file and swap it in, so a crash mid-write
+    never leaves a truncated file behind."""
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+def _windows(text: str):
+    """Yield overlapping slices of about WINDOW_TOKENS, cut at a line or sentence end where possible."""
+    window_chars = WINDOW_TOKENS * CHARS_PER_TOKEN
+    start = 0
+    while True:
+        end = min(start + window_chars, len(text))
+        if end < len(text):
+            cut = max(text.rfind("\n", start, end), text.rfind(". ", start, end))
+            if cut > start + window_chars // 2:
+                end = cut + 1
+        yield text[start:end]
+        if end == len(text):
+            return
+        start = end - WINDOW_OVERLAP_TOKENS * CHARS_PER_TOKEN
+
+class AnalysisCache:
+    """Analyses on disk, keyed by a hash of the model and the transcript file."""
+
+    def __init__(self, cache_dir: Path = ANALYSIS_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._dir_ready = False  # created by the first put, not checked on every one
+
+    @staticmethod
+    def key(model_name: str, transcript_path: Path) -> str:
+        # Streamed in chunks, so a cache hit never loads the whole transcript
+        digest = hashlib.sha256(f"{model_name}\0".encode("utf-8"))
+        with open(transcript_path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        try:
+            return json.loads((self.cache_dir / f"{key}.json").read_bytes())
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, analysis: dict):
+        try:
+            if not self._dir_ready:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                self._dir_ready = True
+            _write_atomic(self.cache_dir / f"{key}.json", _dump_json(analysis))
+        except OSError as e:
+            log.warning("Could not cache the analysis: %s", e)
+
+@lru_cache(maxsize=8)
+def _get_model(api_key: str, model_name: str, json_output: bool = False):
+    """Configure the key and build a model once; every MeetingAnalyzer with the same key shares it."""
+    genai.configure(api_key=api_key)
+    if json_output:
+        return genai.GenerativeModel(
+            model_name,
+            generation_config={"response_mime_type": "application/json", "response_schema": ANALYSIS_SCHEMA}
+        )
+    return genai.GenerativeModel(model_name)
+
 class MeetingAnalyzer:
-    def __init__(self, api_key: str):
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel("gemini-1.5-flash-002")
+    def __init__(self, api_key: str, use_cache: bool = True):
+        self.cache = AnalysisCache() if use_cache else None
+        self.model = _get_model(api_key, MODEL_NAME)
+        self.json_model = _get_model(api_key, MODEL_NAME, json_output=True)
 
-    def _run_prompt(self, prompt: str) -> str:
-        response = self.model.generate_content(prompt)
+    def _run_prompt(self, prompt) -> str:
+        """Send a prompt (a string or a list of text parts) and return the reply text."""
+        response = self.model.generate_content(prompt, request_options=_REQUEST_OPTIONS)
         return response.text.strip()
 
+    def _analyze_combined(self, transcript: str) -> dict:
+        """Extract every section in one request, sending the transcript once."""
+        response = self.json_model.generate_content(
+            [_TRANSCRIPT_HEADER, transcript, _COMBINED_SUFFIX], request_options=_REQUEST_OPTIONS
+        )
+        results = json.loads(response.text)
+        missing = [key for key in PROMPTS if not isinstance(results.get(key), str)]
+        if missing:
+            raise ValueError(f"response is missing {', '.join(missing)}")
+        return {key: results[key].strip() for key in PROMPTS}
+
     def analyze(self, transcript_path: Path) -> dict:
+        if self.cache is not None:
+            cache_key = AnalysisCache.key(MODEL_NAME, transcript_path)
+            if (cached := self.cache.get(cache_key)) is not None:
+                log.info("Using cached analysis for %s", transcript_path.name)
+                return cached
         transcript = transcript_path.read_text(encoding="utf-8")
-        print("Starting analysis using Gemini...")
-
-        prompts = {
-            "summary": f"Summarize the following meeting transcript:\n\n{transcript}",
-            "participants": f"List the people who actively participated in the following meeting transcript. Only include names that actually spoke or contributed:\n\n{transcript}",
-            "tasks": f"Extract any tasks or action items from the meeting transcript below. Include assignee names if mentioned:\n\n{transcript}",
-            "deadlines": f"Extract any deadlines, due dates, or reminders mentioned in the following meeting transcript:\n\n{transcript}",
-            "decisions": f"List the decisions made by the team in the following meeting transcript:\n\n{transcript}",
-            "insights": f"What key insights or noteworthy takeaways can be inferred from the following meeting transcript? These could help with teamwork or project alignment:\n\n{transcript}"
-        }
-
-        results = {}
-        for key, prompt in prompts.items():
-            print(f"✨ Extracting {key}...")
-            try:
-                response = self._run_prompt(prompt)
-                results[key] = response
-            except Exception as e:
-                print(f"Failed to extract {key}: {e}")
-                results[key] = "ERROR"
+        log.info("Starting analysis using Gemini...")
+        transcript = self._maybe_compress(transcript)
+
+        try:
+            results = self._analyze_combined(transcript)
+        except Exception as e:
+            log.warning("Combined analysis failed (%s); extracting each section separately...", e)
+            results = asyncio.run(self._extract_sections(transcript))
 
+        # Only complete analyses are reused; a failed section is retried next time
+        if self.cache is not None and "ERROR" not in results.values():
+            self.cache.put(cache_key, results)
         return results
 
+    def _count_tokens(self, text: str) -> int:
+        """Gemini's own token count for `text`, or the character estimate if the call fails."""
+        try:
+            return self.model.count_tokens(text, request_options=_REQUEST_OPTIONS).total_tokens
+        except Exception as e:
+            log.warning("Could not count transcript tokens; estimating from its length: %s", e)
+            return _estimate_tokens(text)
+
+    def _maybe_compress(self, transcript: str) -> str:
+        """Condense a long transcript into window summaries, so the analysis fits comfortably in context."""
+        # The estimate assumes English; languages that tokenize denser (down to
+        # ~2 characters per token) can't pass the threshold below half of it,
+        # so only transcripts near or over the budget pay for a count_tokens call.
+        if _estimate_tokens(transcript) <= COMPRESS_THRESHOLD_TOKENS // 2:
+            return transcript
+        if (tokens := self._count_tokens(transcript)) <= COMPRESS_THRESHOLD_TOKENS:
+            return transcript
+        windows = list(_windows(transcript))
+        log.info("Transcript is long (%d tokens); condensing it in %d parts first...", tokens, len(windows))
+        return "\n\n".join(asyncio.run(self._summarize_windows(windows)))
+
+    async def _summarize_window(self, window: str) -> str:
+        try:
+            return await asyncio.to_thread(self._run_prompt, [_TRANSCRIPT_HEADER, window, _WINDOW_SUFFIX])
+        except Exception as e:
+            log.warning("Failed to condense part of the transcript; using it as is: %s", e)
+            return window
+
+    async def _summarize_windows(self, windows: list) -> list:
+        return await asyncio.gather(*(self._summarize_window(w) for w in windows))
+
+    async def _extract_section(self, key: str, transcript: str) -> str:
+        log.info("✨ Extracting %s...", key)
+        # No explicit context cache: _maybe_compress has already condensed long
+        # transcripts to well under the size Gemini will cache, and the shared
+        # transcript-first prefix still lets implicit caching reuse it
+        prompt = [_TRANSCRIPT_HEADER, transcript, _PROMPT_SUFFIXES[key]]
+        try:
+            return await asyncio.to_thread(self._run_prompt, prompt)
+        except Exception as e:
+            log.warning("Failed to extract %s: %s", key, e)
+            return "ERROR"
+
+    async def _extract_sections(self, transcript: str) -> dict:
+        """Run the per-section prompts concurrently, so the fallback takes one call's time, not six."""
+        results = await asyncio.gather(*(self._extract_section(key, transcript) for key in PROMPTS))
+        return dict(zip(PROMPTS, results))
+
     def save_analysis(self, analysis: dict, output_path: Path):
-        output_path.write_text(json.dumps(analysis, indent=2), encoding="utf-8")
-        print(f"Analysis saved to {output_path}")
+        _write_atomic(output_path, _dump_json(analysis))
+        log.info("Analysis saved to %s", output_path)
 
 if __name__ == "__main__":
     # Example usage for testing
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
     api_key = os.getenv("GEMINI_API_KEY")
     analyzer = MeetingAnalyzer(api_key)
 
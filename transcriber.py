@@ -1,76 +1,250 @@
+import asyncio
+import errno
+import hashlib
+import json
+import logging
 import os
-import subprocess
 import shutil
+import threading
+from functools import cached_property, lru_cache
 from pathlib import Path
-import whisper
+import av
+import ctranslate2
+import numpy as np
+from faster_whisper import BatchedInferencePipeline, WhisperModel, decode_audio as _decode_audio
+from audio_utils import is_skippable
+
+log = logging.getLogger(__name__)
 
 # Configuration
 BASE_DIR = Path(__file__).parent.resolve()
 RECORDINGS_DIR = BASE_DIR / "recordings"
 PROCESSED_DIR = BASE_DIR / "processed"
 TRANSCRIPTS_DIR = BASE_DIR / "transcripts"
-WHISPER_MODEL_SIZE = "base"
+# Which recording and model produced each transcript, so a model change is noticed
+MANIFEST_PATH = TRANSCRIPTS_DIR / "manifest.json"
+FINGERPRINT_BYTES = 1 << 20  # bytes of each recording hashed to identify it
+# Any faster-whisper model name. The distilled English ones ("distil-large-v3",
+# "distil-medium.en", "distil-small.en") keep only a few decoder layers and
+# decode several times faster than the full-size model they were made from.
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "base")
+WHISPER_BEAM_SIZE = int(os.getenv("WHISPER_BEAM_SIZE", "5"))  # 1 is greedy decoding, fastest
+# CTranslate2 weight precision, e.g. "int8_float16"; unset picks one for the device
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE")
+# Speech segments decoded together in one batch; 1 decodes them one by one
+WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "8"))
+# Opt-in: FlashAttention kernels for float16/bfloat16 on CUDA. The PyPI
+# CTranslate2 wheels are built without them, so only set this with a build
+# that has them.
+WHISPER_FLASH_ATTENTION = os.getenv("WHISPER_FLASH_ATTENTION", "").lower() in ("1", "true", "yes")
+# Silero VAD drops pauses at least this long before the model sees the audio
+WHISPER_VAD_MIN_SILENCE_MS = 500
+SAMPLE_RATE = 16000  # Whisper models take 16 kHz mono audio
+# Recordings in flight at once: one transcribing while the next one's audio is
+# decoded. Each waiting recording holds its whole decoded audio in memory
+# (about 230 MB per hour), and Whisper only takes one at a time, so decoding
+# further ahead costs memory without finishing anything sooner.
+MAX_CONCURRENT_RECORDINGS = 2
 SUPPORTED_VIDEO_FORMATS = (".mp4", ".mkv", ".mov")
+# Lower- and upper-case variants, so a whole filename is classified by one
+# str.endswith call without building a Path or lowercased copy per file.
+_VIDEO_SUFFIXES = tuple(v for ext in SUPPORTED_VIDEO_FORMATS for v in (ext, ext.upper()))
 
 # Ensure folders exist
 for folder in [RECORDINGS_DIR, PROCESSED_DIR, TRANSCRIPTS_DIR]:
     folder.mkdir(parents=True, exist_ok=True)
 
+_model_locks = {}  # model key -> lock serializing transcriptions on that shared model
+_manifest = None  # transcript name -> {"video": fingerprint, "model": model id}, loaded on first use
+_manifest_lock = threading.Lock()
+
+# CTranslate2 runs int8 weights on CPU and float16 on GPU: several times
+# faster than the reference PyTorch model at the same accuracy.
+_DEFAULT_COMPUTE_TYPES = {"cuda": "float16", "cpu": "int8"}
+_FLASH_ATTENTION_TYPES = ("float16", "bfloat16")  # the precisions FlashAttention runs in
+
+@lru_cache(maxsize=1)
+def _default_device():
+    """Use the GPU when there is one; CUDA is probed only once per process."""
+    return "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+
+@lru_cache(maxsize=4)
+def _load_model(model_size, device, compute_type):
+    """Load a Whisper model once per process; later Transcribers reuse the weights."""
+    log.info("🔠 Loading Whisper model '%s'...", model_size)
+    if WHISPER_FLASH_ATTENTION and device == "cuda" and compute_type in _FLASH_ATTENTION_TYPES:
+        # Fused attention kernels keep the attention matrix out of GPU memory
+        try:
+            return WhisperModel(model_size, device=device, compute_type=compute_type, flash_attention=True)
+        except (RuntimeError, ValueError) as e:
+            log.warning("Flash attention was requested but is unavailable (%s); loading without it", e)
+    return WhisperModel(model_size, device=device, compute_type=compute_type)
+
+def _fingerprint(video_path: Path) -> str:
+    """Identify a recording by its size and a hash of its first MiB, without reading all of it."""
+    with open(video_path, "rb") as f:
+        digest = hashlib.blake2b(f.read(FINGERPRINT_BYTES), digest_size=16).hexdigest()
+    return f"{video_path.stat().st_size}-{digest}"
+
+def _load_manifest() -> dict:
+    """Return the transcript manifest, reading it from disk once; call with _manifest_lock held."""
+    global _manifest
+    if _manifest is None:
+        try:
+            _manifest = json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            _manifest = {}
+    return _manifest
+
+def _manifest_entry(transcript_name: str):
+    with _manifest_lock:
+        return _load_manifest().get(transcript_name)
+
+def _record_transcript(transcript_name: str, entry: dict):
+    with _manifest_lock:
+        manifest = _load_manifest()
+        manifest[transcript_name] = entry
+        tmp_path = MANIFEST_PATH.with_suffix(".tmp")
+        try:
+            tmp_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+            os.replace(tmp_path, MANIFEST_PATH)
+        except OSError as e:
+            log.warning("Could not save the transcript manifest: %s", e)
+
+def _move_to_processed(video_path: Path):
+    """Move a recording into processed/, replacing any earlier file of the same name."""
+    # A rename, never a copy, whenever both folders are on one filesystem; that
+    # includes a name clash, where shutil.move on Windows falls back to copying
+    # the whole video and deleting the original.
+    try:
+        os.replace(video_path, PROCESSED_DIR / video_path.name)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(str(video_path), PROCESSED_DIR / video_path.name)
+
 class Transcriber:
-    def __init__(self, model_size=WHISPER_MODEL_SIZE):
-        print(f"üî† Loading Whisper model '{model_size}'...")
-        self.model = whisper.load_model(model_size)
-
-    def convert_to_wav(self, video_path: Path, wav_path: Path):
-        """Convert video to mono 16kHz WAV using ffmpeg."""
-        print(f"üéß Converting {video_path.name} to WAV...")
-        subprocess.run([
-            "ffmpeg", "-y", "-i", str(video_path),
-            "-vn", "-ar", "16000", "-ac", "1", "-f", "wav", str(wav_path)
-        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
-
-    def transcribe_audio(self, wav_path: Path) -> str:
-        """Transcribe the WAV file and return the text."""
-        print(f"üìù Transcribing {wav_path.name}...")
-        result = self.model.transcribe(str(wav_path))
-        return result["text"]
+    def __init__(self, model_size=WHISPER_MODEL_SIZE, device=None, compute_type=WHISPER_COMPUTE_TYPE,
+                 batch_size=WHISPER_BATCH_SIZE):
+        device = device or _default_device()
+        compute_type = compute_type or _DEFAULT_COMPUTE_TYPES.get(device, "default")
+        self.model_key = (model_size, device, compute_type)
+        # One model instance can't transcribe two files at once, but audio
+        # decodes and file moves for other recordings can overlap with it.
+        self._model_lock = _model_locks.setdefault(self.model_key, threading.Lock())
+        self.transcribe_options = {
+            "beam_size": WHISPER_BEAM_SIZE,
+            # Meetings are full of silence; the encoder only runs on speech
+            "vad_filter": True,
+            "vad_parameters": {"min_silence_duration_ms": WHISPER_VAD_MIN_SILENCE_MS},
+        }
+        if model_size.endswith(".en") or model_size.startswith("distil-"):
+            # English-only models: skip the language detection pass
+            self.transcribe_options["language"] = "en"
+        if model_size.startswith("distil-"):
+            # Distilled decoders drift when fed their own earlier output
+            self.transcribe_options["condition_on_previous_text"] = False
+        self.batch_size = batch_size
+        if batch_size > 1:
+            self.transcribe_options["batch_size"] = batch_size
+
+    @cached_property
+    def model(self):
+        """The Whisper model, loaded on first use so idle runs never pay for it."""
+        model = _load_model(*self.model_key)
+        # The batched pipeline cuts the audio at the VAD's silences and decodes
+        # those segments side by side, instead of one 30 s window after another
+        return BatchedInferencePipeline(model) if self.batch_size > 1 else model
+
+    def decode_audio(self, video_path: Path) -> np.ndarray:
+        """Decode a video's first audio track to mono 16kHz float samples, in-process."""
+        log.info("🎧 Decoding audio from %s...", video_path.name)
+        # PyAV (libav, bundled with faster-whisper) demuxes only the audio
+        # stream and resamples it in memory: no ffmpeg process, no temp file.
+        return _decode_audio(str(video_path), sampling_rate=SAMPLE_RATE)
+
+    def transcribe_to(self, audio: np.ndarray, transcript_path: Path):
+        """Transcribe decoded audio, writing each segment to `transcript_path` as it is decoded."""
+        log.info("📝 Transcribing into %s...", transcript_path.name)
+        # Written under a temporary name and renamed when complete, so a crash
+        # mid-transcription never leaves a partial transcript that looks finished.
+        tmp_path = transcript_path.with_suffix(".part")
+        with self._model_lock, tmp_path.open("w", encoding="utf-8") as f:
+            # Segments are decoded lazily, so consume them while holding the model
+            segments, _ = self.model.transcribe(audio, **self.transcribe_options)
+            for segment in segments:
+                f.write(segment.text)
+        os.replace(tmp_path, transcript_path)
 
     def process_recording(self, video_path: Path):
-        """Process a single video: convert, transcribe, save, and move."""
+        """Process a single video: decode, transcribe, save, and move."""
         base_name = video_path.stem
-        wav_path = RECORDINGS_DIR / f"{base_name}.wav"
         transcript_path = TRANSCRIPTS_DIR / f"{base_name}_notes.txt"
 
-        if transcript_path.exists():
-            print(f"‚è© Already transcribed: {video_path.name}")
-            return
-
+        model_id = "/".join(self.model_key)
         try:
-            self.convert_to_wav(video_path, wav_path)
-            transcript = self.transcribe_audio(wav_path)
-            transcript_path.write_text(transcript, encoding="utf-8")
-            print(f"‚úÖ Saved transcript to {transcript_path.name}")
-
-            # Move original video and WAV
-            shutil.move(str(video_path), PROCESSED_DIR / video_path.name)
-            shutil.move(str(wav_path), PROCESSED_DIR / wav_path.name)
-            print(f"üìÅ Moved files to processed/: {video_path.name}")
-
-        except subprocess.CalledProcessError:
-            print(f"‚ùå ffmpeg failed on: {video_path.name}")
+            if transcript_path.exists():
+                recorded = _manifest_entry(transcript_path.name)
+                # Transcripts written before the manifest existed have no entry;
+                # keep them without reading the video at all
+                if recorded is None or (recorded["model"] == model_id
+                                        and recorded["video"] == _fingerprint(video_path)):
+                    log.debug("Already transcribed: %s", video_path.name)
+                    return
+
+            audio = self.decode_audio(video_path)
+            if is_skippable(audio, SAMPLE_RATE):
+                # Nothing worth transcribing; file it away so it isn't retried every run
+                log.info("Skipping %s: silent or too short", video_path.name)
+                _move_to_processed(video_path)
+                return
+            self.transcribe_to(audio, transcript_path)
+            _record_transcript(transcript_path.name, {"video": _fingerprint(video_path), "model": model_id})
+            log.info("✅ Saved transcript to %s", transcript_path.name)
+
+            # Move the original video
+            _move_to_processed(video_path)
+            log.info("📁 Moved the recording to processed/: %s", video_path.name)
+
+        except av.error.FFmpegError as e:
+            log.error("❌ Could not decode the audio of %s: %s", video_path.name, e)
         except Exception as e:
-            print(f"‚ùå Error processing {video_path.name}: {e}")
+            log.error("❌ Error processing %s: %s", video_path.name, e)
+
+    def _find_recordings(self):
+        """List the video files waiting in the recordings folder."""
+        log.debug("📂 Looking for recordings in %s", RECORDINGS_DIR)
+        # scandir's DirEntry answers is_file() from the directory listing, so
+        # this is one pass with no per-file stat. Collect the list up front
+        # since process_recording moves files out of the folder.
+        with os.scandir(RECORDINGS_DIR) as entries:
+            video_files = [Path(entry.path) for entry in entries
+                           if entry.name.endswith(_VIDEO_SUFFIXES) and entry.is_file(follow_symlinks=False)]
+        log.info("Found %d recordings in %s", len(video_files), RECORDINGS_DIR)
+        return video_files
 
-    def process_all(self):
+    def process_all(self, max_concurrent=MAX_CONCURRENT_RECORDINGS):
         """Process all video files in the recordings folder."""
-        print(f"üìÇ Looking for recordings in {RECORDINGS_DIR}")
-        for video_file in RECORDINGS_DIR.iterdir():
-            if video_file.suffix.lower() in SUPPORTED_VIDEO_FORMATS:
-                self.process_recording(video_file)
+        asyncio.run(self.process_all_async(max_concurrent))
+
+    async def process_all_async(self, max_concurrent=MAX_CONCURRENT_RECORDINGS):
+        """Process the recordings folder with up to `max_concurrent` files in flight."""
+        video_files = self._find_recordings()
+        semaphore = asyncio.Semaphore(max_concurrent)
+
+        async def process_one(video_file):
+            async with semaphore:
+                await asyncio.to_thread(self.process_recording, video_file)
+
+        results = await asyncio.gather(*(process_one(f) for f in video_files), return_exceptions=True)
+        for video_file, result in zip(video_files, results):
+            if isinstance(result, BaseException):
+                log.error("Failed to process %s: %s", video_file.name, result)
 
 # --- Test the module when run directly ---
 if __name__ == "__main__":
-    print("üîÅ Starting transcription pipeline...")
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+    log.info("🔁 Starting transcription pipeline...")
     transcriber = Transcriber()
     transcriber.process_all()
-    print("üéâ All done!")
+    log.info("🎉 All done!")